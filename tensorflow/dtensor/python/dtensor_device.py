@@ -18,7 +18,7 @@ import contextlib
 import logging
 import os
 import threading
-from typing import List, Set
+from typing import Dict, List, Set
 
 import numpy as np
 
@@ -29,6 +29,7 @@ from tensorflow.dtensor.python import gen_dtensor_ops
 from tensorflow.dtensor.python import layout as layout_lib
 from tensorflow.python.eager import context
 from tensorflow.python.eager import core
+from tensorflow.python.framework import c_api_util
 from tensorflow.python.framework import device as tf_device
 from tensorflow.python.framework import dtypes
 from tensorflow.python.framework import ops
@@ -70,51 +71,87 @@ class DTensorDevice(object):
       _next_device_number += 1
     device, device_info = _dtensor_device.Allocate(self.name)
     context.register_custom_device(device, self.name, device_info)
+    # Registration initializes `ctx`, so its handle is available here.
+    self._context_and_handle = (ctx, ctx._handle)  # pylint: disable=protected-access
 
     self._device_info = device_info
+    # The DTensor cluster environment variables are set at process startup and
+    # are not expected to change for the lifetime of the device.
+    self._cached_num_clients = int(os.environ.get(_DT_NUM_CLIENTS, "1"))
+    self._cached_client_id = int(os.environ.get(_DT_CLIENT_ID, "0"))
+    self._cached_job_name = os.environ.get(_DT_JOB_NAME, "localhost")
+    if self._cached_job_name == "localhost":
+      self._cached_full_job_name = "localhost/replica:0/task:0"
+    else:
+      self._cached_full_job_name = (
+          self._cached_job_name + "/replica:0/task:" +
+          str(self._cached_client_id))
+    self._cpu_device_spec = tf_device.DeviceSpec(
+        job=self._cached_full_job_name, device_type="CPU", device_index=0)
     self._current_output_layout = None
     self._is_async = is_async
-    self._meshes = set()
+    # Registered meshes, keyed by their string representation.
+    self._meshes: Dict[str, layout_lib.Mesh] = {}
     self._mesh_lock = threading.Lock()
+    # Holds a per-thread (context, device scope) pair, see _eager_device_scope.
+    self._thread_local = threading.local()
     for mesh in meshes:
       self._register_mesh(mesh)
 
+  def _context_handle(self):
+    """Returns the handle of the current eager context."""
+    ctx, handle = self._context_and_handle
+    current_ctx = context.context()
+    # The handle only changes if the global context is reset.
+    if current_ctx is not ctx:
+      handle = current_ctx._handle  # pylint: disable=protected-access
+      self._context_and_handle = (current_ctx, handle)
+    return handle
+
+  def _eager_device_scope(self):
+    """Returns a reusable eager device scope placing ops on this device.
+
+    Device scopes keep a stack of the devices they replaced, so the same scope
+    cannot be shared across threads. Each thread caches its own.
+    """
+    ctx = context.context()
+    cached = getattr(self._thread_local, "device_scope", None)
+    if cached is None or cached[0] is not ctx:
+      cached = (ctx, ctx.device(self.name))
+      self._thread_local.device_scope = cached
+    return cached[1]
+
 # LINT.IfChange
   def _num_clients(self):
     """Returns number of clients in current DTensor cluster."""
     # If missing, 1 is a good default.
-    return int(os.environ.get(_DT_NUM_CLIENTS, "1"))
+    return self._cached_num_clients
 # LINT.ThenChange(//tensorflow/dtensor/cc/dtensor_utils.cc)
 
 # LINT.IfChange
   def _client_id(self):
     """Returns current client ID (int) in current DTensor cluster."""
-    return int(os.environ.get(_DT_CLIENT_ID, "0"))
+    return self._cached_client_id
 # LINT.ThenChange(//tensorflow/dtensor/cc/dtensor_utils.cc)
 
   def _job_name(self):
     """Returns the DTensor Borg job name."""
     # If missing, the program is likely running locally or on Forge.
-    return os.environ.get(_DT_JOB_NAME, "localhost")
+    return self._cached_job_name
 
   def _full_job_name(self):
     """Returns the fully qualified TF job name for this or another task."""
-    if self._job_name() == "localhost":
-      return "localhost/replica:0/task:0"
-    return self._job_name() + "/replica:0/task:" + str(self._client_id())
+    return self._cached_full_job_name
 
   def _create_host_array(self, shape, host_id):
     """Returns ID and device lists that can be used to create a host mesh."""
     num_global_devices = np.prod(shape)
-    global_device_ids = np.arange(num_global_devices).reshape(shape)
-    local_device_list = [
-        tf_device.DeviceSpec(
-            job=self._full_job_name(), device_type="CPU", device_index=0)
-    ]
-    num_local_devices = len(local_device_list)
-    local_device_ids = [
-        x + host_id * num_local_devices for x in range(num_local_devices)
-    ]
+    # Host meshes are small, so int32 IDs suffice.
+    global_device_ids = np.arange(
+        num_global_devices, dtype=np.int32).reshape(shape)
+    # Each host contributes exactly one local CPU device.
+    local_device_list = [self._cpu_device_spec]
+    local_device_ids = [host_id]
     return global_device_ids, local_device_ids, local_device_list
 
   def _create_embedding_host_mesh(self, tpu_mesh: layout_lib.Mesh):
@@ -127,22 +164,23 @@ class DTensorDevice(object):
 
     ts_local_device_ids = []
     ts_local_devices = []
-    for local_device_str in tpu_mesh.local_devices():
+    # Filter on the mesh's own DeviceSpecs, so no device string is formatted
+    # or parsed.
+    for device_spec in tpu_mesh.local_device_specs():
       # We only need to keep TPU:0 for each client.
-      if not local_device_str.endswith("TPU:0"):
+      if device_spec.device_index != 0:
         continue
 
-      device_spec = tf_device.DeviceSpec.from_string(local_device_str)
       ts_local_device_ids.append(device_spec.task)
       ts_local_devices.append(device_spec.replace(device_type="CPU"))
 
-    if not ts_local_device_ids or not ts_local_device_ids:
+    if not ts_local_device_ids or not ts_local_devices:
       logging.info(
           "Cannot create tpu system mesh as %s has no `TPU:0` local device "
           "found", tpu_mesh.to_string())
       return None
 
-    ts_global_device_ids = np.arange(self._num_clients())
+    ts_global_device_ids = np.arange(self._cached_num_clients)
     # TODO(zhonglinhan): parse global device specs as input when not None.
     return layout_lib.Mesh(
         dim_names=[tpu_mesh.dim_names[0]],  # 1D mesh.
@@ -152,37 +190,47 @@ class DTensorDevice(object):
 
   def _register_mesh(self, mesh: layout_lib.Mesh):
     """Idempotently register `mesh` with the dtensor device."""
+    mesh_str = mesh.to_string()
+    # Most calls re-register a known mesh, so check before taking the lock.
+    if mesh_str in self._meshes:
+      return
     with self._mesh_lock:
-      if mesh not in self._meshes:
-        _dtensor_device.AddMesh(self._device_info, mesh.to_string(),
-                                self._is_async, False)
-        self._meshes.add(mesh)
+      if mesh_str not in self._meshes:
+        # Entries are (serialized_mesh, is_async, is_host_mesh), registered
+        # with the device in a single native call.
+        batch = [(mesh_str, self._is_async, False)]
+        new_meshes = {mesh_str: mesh}
         if mesh.device_type().upper() == "TPU":
+          host_mesh = mesh.host_mesh()
+          host_mesh_str = host_mesh.to_string()
           logging.info(
               "Registering virtual 1:1 mapped host mesh %s for mesh %s",
-              mesh.host_mesh().to_string(), mesh.to_string())
-          _dtensor_device.AddMesh(self._device_info,
-                                  mesh.host_mesh().to_string(), self._is_async,
-                                  True)
-          self._meshes.add(mesh.host_mesh())
+              host_mesh_str, mesh_str)
+          batch.append((host_mesh_str, self._is_async, True))
+          new_meshes[host_mesh_str] = host_mesh
           embedding_host_mesh = self._create_embedding_host_mesh(mesh)
           if embedding_host_mesh:
+            embedding_host_mesh_str = embedding_host_mesh.to_string()
             logging.info(
                 "Registering embedding host mesh %s on each client for mesh %s ",
-                embedding_host_mesh.to_string(), mesh.to_string())
-            _dtensor_device.AddMesh(self._device_info,
-                                    embedding_host_mesh.to_string(),
-                                    self._is_async, False)
-            self._meshes.add(embedding_host_mesh)
+                embedding_host_mesh_str, mesh_str)
+            batch.append((embedding_host_mesh_str, self._is_async, False))
+            new_meshes[embedding_host_mesh_str] = embedding_host_mesh
+        _dtensor_device.AddMeshes(self._device_info, batch)
+        self._meshes.update(new_meshes)
 
   @property
   def meshes(self) -> Set[layout_lib.Mesh]:
-    return self._meshes
+    return set(self._meshes.values())
 
   def copy_to_mesh(self, tensor, new_layout, source_layout=None) -> ops.Tensor:
     """Copy `tensor` to `device` with the given layout."""
     self._register_mesh(new_layout.mesh)
-    with ops.device(self.name):
+    if context.executing_eagerly():
+      device_scope = self._eager_device_scope()
+    else:
+      device_scope = ops.device(self.name)
+    with device_scope:
       return gen_dtensor_ops.copy_to_mesh(
           tensor,
           layout=new_layout.to_string(),
@@ -315,27 +363,39 @@ class DTensorDevice(object):
     """
     if not context.executing_eagerly():
       raise RuntimeError("Pack must be called eagerly.")
-    if any(
-        issubclass(type(t), resource_variable_ops.BaseResourceVariable)
-        for t in tensors):
-      raise TypeError(
-          "Received Variable input to Pack, Variable is not supported.")
+    # Classify the inputs in a single pass.
+    num_sparse = 0
+    for t in tensors:
+      if isinstance(t, resource_variable_ops.BaseResourceVariable):
+        raise TypeError(
+            "Received Variable input to Pack, Variable is not supported.")
+      if isinstance(t, sparse_tensor.SparseTensor):
+        num_sparse += 1
+    if num_sparse and num_sparse != len(tensors):
+      raise TypeError("Cannot Pack SparseTensors with Tensors.")
     self._register_mesh(layout.mesh)
-    with ops.device(self.name):
-      if all(isinstance(t, sparse_tensor.SparseTensor) for t in tensors):
-        if not all(t.shape == tensors[0].shape for t in tensors):
+    with self._eager_device_scope():
+      if num_sparse:
+        first_shape = tensors[0].shape
+        if not all(t.shape == first_shape for t in tensors):
           raise TypeError("All input SparseTensors to Pack must be same shape.")
         is_sparse = True
-        tensors = [t.indices for t in tensors] + [t.values for t in tensors] + [
-            ops.convert_to_tensor(t.shape, dtype=dtypes.int64) for t in tensors
-        ]
-      elif any(isinstance(t, sparse_tensor.SparseTensor) for t in tensors):
-        raise TypeError("Cannot Pack SparseTensors with Tensors.")
+        # All shapes are equal, so a single shape tensor is shared by every
+        # component.
+        shape_tensor = ops.convert_to_tensor(first_shape, dtype=dtypes.int64)
+        # Flatten into [indices..., values..., shapes...] in a single pass.
+        n = len(tensors)
+        flat_tensors = [None] * (3 * n)
+        for i, t in enumerate(tensors):
+          flat_tensors[i] = t.indices
+          flat_tensors[i + n] = t.values
+          flat_tensors[i + 2 * n] = shape_tensor
+        tensors = flat_tensors
       else:
         is_sparse = False
       try:
         return _dtensor_device.Pack(
-            context.context()._handle,  # pylint: disable=protected-access
+            self._context_handle(),
             tensors,
             layout.to_string(),
             self._device_info,
@@ -358,29 +418,29 @@ class DTensorDevice(object):
     """
     if not context.executing_eagerly():
       raise RuntimeError("Unpack must be called eagerly.")
-    if issubclass(type(tensor), resource_variable_ops.BaseResourceVariable):
+    if isinstance(tensor, resource_variable_ops.BaseResourceVariable):
       raise TypeError(
           "Received Variable input to unpack, Variable is not supported.")
     try:
       tensors = _dtensor_device.Unpack(
-          context.context()._handle,  # pylint: disable=protected-access
+          self._context_handle(),
           tensor,
           self._device_info)
     except core._NotOkStatusException as e:  # pylint: disable=protected-access
       raise core._status_to_exception(e) from None  # pylint: disable=protected-access
 
     is_sparse = _dtensor_device.IsSparseDTensor(
-        context.context()._handle,  # pylint: disable=protected-access.
+        self._context_handle(),
         tensor,
         self._device_info)
     if is_sparse:
-      result = []
-      for i in range(len(tensors) // 3):
-        result.append(
-            sparse_tensor.SparseTensor(tensors[i],
-                                       tensors[i + len(tensors) // 3],
-                                       tensors[i + 2 * len(tensors) // 3]))
-      return result
+      # Components are laid out as [indices..., values..., shapes...].
+      n = len(tensors) // 3
+      return [
+          sparse_tensor.SparseTensor(indices, values, shape)
+          for indices, values, shape in zip(tensors[:n], tensors[n:2 * n],
+                                            tensors[2 * n:])
+      ]
     else:
       return tensors
 
@@ -392,11 +452,11 @@ class DTensorDevice(object):
     """
     if not context.executing_eagerly():
       raise RuntimeError("FetchLayout must be called eagerly.")
-    if issubclass(type(tensor), resource_variable_ops.BaseResourceVariable):
+    if isinstance(tensor, resource_variable_ops.BaseResourceVariable):
       tensor = tensor.read_value()
     try:
       layout_string = _dtensor_device.FetchLayout(
-          context.context()._handle,  # pylint: disable=protected-access
+          self._context_handle(),
           tensor,
           self._device_info)
     except core._NotOkStatusException as e:  # pylint: disable=protected-access
@@ -436,7 +496,7 @@ class DTensorDevice(object):
       A list of corresponding TPU core locations.
     """
     return _dtensor_device.TPUCoreIDsToLocations(
-        context.context()._handle,  # pylint: disable=protected-access
+        self._context_handle(),
         self._device_info,
         tpu_core_ids)
 
@@ -451,7 +511,7 @@ class DTensorDevice(object):
       A list of corresponding TPU core IDs.
     """
     return _dtensor_device.TPUCoreLocationsToIDs(
-        context.context()._handle,  # pylint: disable=protected-access
+        self._context_handle(),
         self._device_info,
         tpu_core_locations)
 
@@ -463,7 +523,6 @@ class DTensorDevice(object):
     yield
     _dtensor_device.ExperimentalClearDefaultMesh(self._device_info)
 
-  @contextlib.contextmanager
   def _default_layout(self, layout: layout_lib.Layout):
     """Sets a default output layout for all ops in the scope.
 
@@ -484,47 +543,69 @@ class DTensorDevice(object):
     Args:
       layout: A Layout for the outputs of all operations in this scope.
 
-    Yields:
-      Nothing.
+    Returns:
+      A context manager for the scope.
     """
+    if context.executing_eagerly():
+      return self._default_layout_eager(layout)
+    return self._default_layout_graph(layout)
+
+  def _set_default_layout(self, layout: layout_lib.Layout):
+    """Makes `layout` the default output layout and returns the previous one."""
     self._register_mesh(layout.mesh)
+    previous_default = self._current_output_layout
+    self._current_output_layout = layout.to_string().encode("utf-8")
+    _dtensor_device.ExperimentalSetDefaultLayout(self._device_info,
+                                                 self._current_output_layout)
+    return previous_default
+
+  def _restore_default_layout(self, previous_default):
+    """Restores a default output layout returned by `_set_default_layout`."""
+    self._current_output_layout = previous_default
+    if self._current_output_layout is None:
+      _dtensor_device.ExperimentalClearDefaultLayout(self._device_info)
+    else:
+      _dtensor_device.ExperimentalSetDefaultLayout(
+          self._device_info, self._current_output_layout.decode("utf-8"))
+
+  @contextlib.contextmanager
+  def _default_layout_eager(self, layout: layout_lib.Layout):
+    """Eager implementation of `_default_layout`."""
+    previous_default = self._set_default_layout(layout)
     try:
-      previous_default = self._current_output_layout
-      self._current_output_layout = layout.to_string().encode("utf-8")
-      _dtensor_device.ExperimentalSetDefaultLayout(self._device_info,
-                                                   self._current_output_layout)
-      if context.executing_eagerly():
-        graph = None
-        previous_graph_size = None
-        with ops.device(self.name):
-          yield
-      else:
-        # Custom devices currently don't affect graph building, so we need a
-        # separate way to indicate layouts.
-        #
-        # TODO(allenl): Remove this case once the DTensor device is active
-        # during tracing.
-        graph = ops.get_default_graph()
-        previous_graph_size = len(graph.get_operations())
+      with self._eager_device_scope():
         yield
     finally:
-      if graph is not None:  # pytype: disable=name-error  # py39-upgrade
+      self._restore_default_layout(previous_default)
+
+  @contextlib.contextmanager
+  def _default_layout_graph(self, layout: layout_lib.Layout):
+    """Graph implementation of `_default_layout`."""
+    # Custom devices currently don't affect graph building, so we need a
+    # separate way to indicate layouts.
+    #
+    # TODO(allenl): Remove this case once the DTensor device is active
+    # during tracing.
+    graph = ops.get_default_graph()
+    previous_last_id = graph._last_id  # pylint: disable=protected-access
+    previous_default = self._set_default_layout(layout)
+    try:
+      try:
+        yield
+      finally:
+        # The same layout and mesh attributes are set on every op in the
+        # scope, so serialize them once rather than once per op.
+        layout_buf = c_api_util.ScopedTFBuffer(
+            attr_value_pb2.AttrValue(
+                list=attr_value_pb2.AttrValue.ListValue(
+                    s=[self._current_output_layout])).SerializeToString())
+        mesh_buf = c_api_util.ScopedTFBuffer(
+            attr_value_pb2.AttrValue(
+                s=layout.mesh.to_string().encode("utf-8")).SerializeToString())
         # Tag operations added under this scope
-        for operation in graph.get_operations()[previous_graph_size:]:  # pytype: disable=name-error  # py39-upgrade
+        for operation in graph._operations_since(previous_last_id):  # pylint: disable=protected-access
           # Set layout directly on the Op itself.
-          operation._set_attr(  # pylint: disable=protected-access
-              "_layout",
-              attr_value_pb2.AttrValue(
-                  list=attr_value_pb2.AttrValue.ListValue(
-                      s=[self._current_output_layout])))
-          operation._set_attr(  # pylint: disable=protected-access
-              "_mesh",
-              attr_value_pb2.AttrValue(
-                  s=layout.mesh.to_string().encode("utf-8")))
-
-      self._current_output_layout = previous_default  # pytype: disable=name-error  # py39-upgrade
-      if self._current_output_layout is None:
-        _dtensor_device.ExperimentalClearDefaultLayout(self._device_info)
-      else:
-        _dtensor_device.ExperimentalSetDefaultLayout(
-            self._device_info, self._current_output_layout.decode("utf-8"))
+          operation._set_attr_with_buf("_layout", layout_buf.buffer)  # pylint: disable=protected-access
+          operation._set_attr_with_buf("_mesh", mesh_buf.buffer)  # pylint: disable=protected-access
+    finally:
+      self._restore_default_layout(previous_default)
@@ -143,6 +143,11 @@ class Mesh(object):
     self._local_devices = local_devices
     self._global_devices = global_devices
     self._name = mesh_name
+    # Lazily populated by `to_string` and `__hash__`; a Mesh is not mutated
+    # after __init__.
+    self._cached_string = None
+    self._cached_serialized_proto = None
+    self._cached_hash = None
 
   @property
   def dim_names(self) -> List[str]:
@@ -243,12 +248,18 @@ class Mesh(object):
     """Returns a list of local device specs represented as strings."""
     return [d.to_string() for d in self._local_devices]
 
+  def local_device_specs(self) -> List[tf_device.DeviceSpec]:
+    """Returns a list of local device specs."""
+    return list(self._local_devices)
+
   def num_local_devices(self) -> int:
     """Returns the number of local devices."""
     return len(self._local_devices)
 
   def to_string(self) -> str:
     """Returns string representation of Mesh."""
+    if self._cached_string is not None:
+      return self._cached_string
 
     # Get proto representation
     mesh_proto = self.as_proto()
@@ -264,7 +275,8 @@ class Mesh(object):
       global_devices = ','.join(dev for dev in mesh_proto.global_devices)
       components.append(global_devices)
     # Separate mesh components with '|'.
-    return '|'.join(components)
+    self._cached_string = '|'.join(components)
+    return self._cached_string
 
   def as_proto(self) -> layout_pb2.MeshProto:
     """Returns mesh protobuffer."""
@@ -374,16 +386,26 @@ class Mesh(object):
                            (name, self._dim_dict.keys()))
     return self._dim_dict[name]
 
+  def _serialized_proto(self) -> bytes:
+    """Returns the deterministically serialized mesh proto."""
+    if self._cached_serialized_proto is None:
+      self._cached_serialized_proto = self.as_proto().SerializeToString(
+          deterministic=True)
+    return self._cached_serialized_proto
+
   # TODO(b/168730933): Define a nicer mesh ID.
   def __hash__(self):
-    return hash(self.as_proto().SerializeToString(deterministic=True))
+    if self._cached_hash is None:
+      self._cached_hash = hash(self._serialized_proto())
+    return self._cached_hash
 
   def __eq__(self, other):
     if not isinstance(other, type(self)) and not isinstance(self, type(other)):
       raise ValueError('comparing with type : {0} but expecting : {1}'.format(
           type(other), type(self)))
-    return self.as_proto().SerializeToString() == other.as_proto(
-    ).SerializeToString()
+    if self is other:
+      return True
+    return self._serialized_proto() == other._serialized_proto()  # pylint: disable=protected-access
 
 
 # TODO(hthu): Consider making this class immutable.
@@ -14,6 +14,7 @@ limitations under the License.
 ==============================================================================*/
 
 #include <string>
+#include <tuple>
 #include <vector>
 
 #include "pybind11/pybind11.h"
@@ -114,6 +115,25 @@ PYBIND11_MODULE(_dtensor_device, m) {
       throw py::error_already_set();
     }
   });
+  // Registers several meshes in a single call. Each entry of `meshes` is a
+  // tuple of (serialized_mesh, is_async, is_host_mesh). Registration stops at
+  // the first mesh which fails to parse.
+  m.def("AddMeshes",
+        [](const py::capsule& device_info,
+           const std::vector<std::tuple<std::string, bool, bool>>& meshes) {
+          std::unique_ptr<TF_Status, decltype(&TF_DeleteStatus)> status(
+              TF_NewStatus(), TF_DeleteStatus);
+          void* info = PyCapsule_GetPointer(device_info.ptr(),
+                                            "TFE_CustomDevice_DeviceInfo");
+          for (const auto& mesh : meshes) {
+            AddMesh(std::get<0>(mesh), info, std::get<1>(mesh),
+                    std::get<2>(mesh), status.get());
+            if (TF_GetCode(status.get()) != TF_OK) {
+              PyErr_SetString(PyExc_ValueError, TF_Message(status.get()));
+              throw py::error_already_set();
+            }
+          }
+        });
   m.def(
       "ExperimentalSetDefaultLayout",
       [](const py::capsule& device_info, const std::string& serialized_layout) {
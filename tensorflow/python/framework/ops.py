@@ -4147,6 +4147,29 @@ class Graph(object):
   def _last_id(self):
     return self._next_id_counter
 
+  def _operations_since(self, op_id):
+    """Returns the operations added to the graph after the op with `op_id`.
+
+    Unlike slicing `get_operations()`, this only visits the new operations.
+
+    Args:
+      op_id: A value previously returned by `_last_id`.
+
+    Returns:
+      A list of Operations, in the order they were added to the graph.
+    """
+    if self._finalized:
+      return [
+          self._nodes_by_id[i]
+          for i in range(op_id + 1, self._next_id_counter + 1)
+      ]
+
+    with self._lock:
+      return [
+          self._nodes_by_id[i]
+          for i in range(op_id + 1, self._next_id_counter + 1)
+      ]
+
   def _get_op_def(self, type):  # pylint: disable=redefined-builtin
     """Returns the `OpDef` proto for `type`. `type` is a string."""
     # NOTE: No locking is required because the lookup and insertion operations
@@ -3008,6 +3008,18 @@ class GraphTest(test_util.TensorFlowTestCase):
     self._AssertDefault(orig)
     self.assertFalse(ops.has_default_graph())
 
+  def testOperationsSince(self):
+    # pylint: disable=protected-access
+    with ops.Graph().as_default() as g:
+      constant_op.constant(1.0, name="a")
+      last_id = g._last_id
+      b = constant_op.constant(2.0, name="b")
+      c = constant_op.constant(3.0, name="c")
+      self.assertEqual([b.op, c.op], g._operations_since(last_id))
+      self.assertEqual([], g._operations_since(g._last_id))
+      self.assertEqual(g.get_operations(), g._operations_since(0))
+    # pylint: enable=protected-access
+
   def testPreventFeeding(self):
     g = ops.Graph()
     a = constant_op.constant(2.0)